@@ -1,16 +1,25 @@
 import os
-import json
 import time
+import random
+import re
 import glob
+import fnmatch
+import mmap
 import hashlib
 import asyncio
+import logging
 import aiohttp
+import orjson
+import ahocorasick
 import docker
+from multidict import CIMultiDict, CIMultiDictProxy
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 
 # Configuration is loaded from a local JSON file
-with open('config.json', 'r') as f:
-    config = json.load(f)
+with open('config.json', 'rb') as f:
+    config = orjson.loads(f.read())
 
 VOLUMES_DIR = config.get('volumes_dir', '/var/lib/pterodactyl/volumes')
 STRATEGIES_DIR = Path(__file__).resolve().parent / 'strategies'
@@ -18,63 +27,156 @@ PUBLIC_WEBHOOK_URL = config.get('public_whook')
 PRIVATE_WEBHOOK_URL = config.get('private_whook')
 PTERODACTYL_API_URL = config.get('panel') + "/api/application"
 PTERODACTYL_API_KEY = config.get('key')
+SCAN_CONCURRENCY = config.get('scan_concurrency', 32)
+PANEL_CONCURRENCY = config.get('panel_concurrency', 8)
+PANEL_MAX_RETRIES = 5
+READ_CHUNK_SIZE = 1024 * 1024
+# Hash large files through mmap. Off by default: a file truncated while mapped
+# raises SIGBUS, and volume contents are controlled by the server owner.
+MMAP_HASHING = config.get('mmap_hashing', False)
+
+# Built once instead of per request; aiohttp still merges these with the session
+# defaults into a new CIMultiDict for every request
+PANEL_HEADERS = CIMultiDictProxy(CIMultiDict({
+    'Accept': "application/json",
+    'Authorization': f"Bearer {PTERODACTYL_API_KEY}"
+}))
+
+logger = logging.getLogger(__name__)
 
 docker_client = docker.from_env()
 
+# Shared HTTP session and panel request limiter, created inside the running loop by main()
+http_session = None
+panel_semaphore = None
+
 # Load flagged containers to avoid redundant checks
 if os.path.exists('flagged.json'):
-    with open('flagged.json', 'r') as f:
-        flagged_containers = json.load(f)
+    with open('flagged.json', 'rb') as f:
+        flagged_containers = orjson.loads(f.read())
 else:
     flagged_containers = {}
 
-# Calculate SHA256 hash for a given file
-async def calculate_file_hash(file_path):
+# Cached file hashes, keyed by path as ((inode, size, mtime_ns, ctime_ns), sha256).
+# Paths not hashed during a scan cycle are pruned at its end.
+hash_cache = {}
+hash_cache_used = set()
+
+# Parsed strategies by file path, as ((mtime_ns, size), strategy or None if invalid)
+strategy_cache = {}
+
+# Network totals per container for the current scan cycle
+network_usage_cache = {}
+# Cleared if the Docker daemon turns out to be too old for one-shot stats
+stats_one_shot = True
+
+# Write JSON to a temporary file and swap it in, so a crash never leaves a partial file
+def atomic_write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Hint the kernel to read ahead aggressively on a file read start to end (Linux only)
+def advise_sequential(f):
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+# Hash an open file with SHA256
+def hash_open_file(f, size):
+    advise_sequential(f)
+    if MMAP_HASHING and size > READ_CHUNK_SIZE:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            return hashlib.sha256(mm).hexdigest()
+    if hasattr(hashlib, 'file_digest'):
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+    # Python < 3.11: reuse one buffer instead of allocating per chunk
     hash_sha256 = hashlib.sha256()
+    buffer = bytearray(READ_CHUNK_SIZE)
+    view = memoryview(buffer)
+    while n := f.readinto(buffer):
+        hash_sha256.update(view[:n])
+    return hash_sha256.hexdigest()
+
+# Stat fields identifying a file version. ctime is included because, unlike
+# mtime, it cannot be set back from userland after a modification.
+def file_version(st):
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+# Calculate SHA256 hash for a given file (blocking; call via asyncio.to_thread).
+# Files whose stat version is unchanged reuse the cached digest.
+def calculate_file_hash(file_path):
+    file_path = str(file_path)
     try:
+        hash_cache_used.add(file_path)
+        cached = hash_cache.get(file_path)
+        if cached and cached[0] == file_version(os.stat(file_path)):
+            return cached[1]
         with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
+            version = file_version(os.fstat(f.fileno()))
+            digest = hash_open_file(f, version[1])
+        hash_cache[file_path] = (version, digest)
+        return digest
     except Exception as e:
         print(f"Error calculating hash for {file_path}: {e}")
         return None
 
-# Get the Pterodactyl server ID associated with a given UUID
-async def get_server_id_from_uuid(uuid):
-    headers = {
-        'Accept': "application/json",
-        'Content-Type': "application/json",
-        'Authorization': f"Bearer {PTERODACTYL_API_KEY}"
-    }
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(f"{PTERODACTYL_API_URL}/servers?per_page=50000", headers=headers) as resp:
-                data = await resp.json()
-                for server in data.get('data', []):
-                    if server['attributes']['uuid'] == uuid:
-                        return server['attributes']['id']
-            return None
-        except Exception as e:
-            print(f"Error fetching server data: {e}")
-            return None
+# Send a request to the Pterodactyl API, bounded by PANEL_CONCURRENCY and retried
+# with exponential back-off and jitter while the panel reports overload.
+# Returns the status code and raw body of the last response.
+async def panel_request(method, path):
+    for attempt in range(PANEL_MAX_RETRIES + 1):
+        async with panel_semaphore:
+            async with http_session.request(method, f"{PTERODACTYL_API_URL}{path}", headers=PANEL_HEADERS) as resp:
+                if resp.status not in (429, 503) or attempt == PANEL_MAX_RETRIES:
+                    return resp.status, await resp.read()
+                retry_after = resp.headers.get('Retry-After', '')
+        delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+        delay += random.uniform(0, delay / 2)
+        print(f"Panel overloaded (status {resp.status}) on {path}. Retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+# Build a UUID -> server ID map from the Pterodactyl panel, following pagination.
+# Returns None if any page could not be fetched.
+async def build_uuid_index():
+    uuid_index = {}
+    page = 1
+    try:
+        while True:
+            status, body = await panel_request('GET', f"/servers?per_page=50000&page={page}")
+            if status != 200:
+                print(f"Failed to fetch server data. Status code: {status}")
+                return None
+            data = orjson.loads(body)
+            for server in data.get('data', []):
+                attributes = server['attributes']
+                uuid_index[attributes['uuid']] = attributes['id']
+            total_pages = data.get('meta', {}).get('pagination', {}).get('total_pages', 1)
+            if page >= total_pages:
+                break
+            page += 1
+    except Exception as e:
+        print(f"Error fetching server data: {e}")
+        return None
+    return uuid_index
 
 # Suspend server via Pterodactyl API
 async def suspend_server(server_id):
-    headers = {
-        'Accept': "application/json",
-        'Content-Type': "application/json",
-        'Authorization': f"Bearer {PTERODACTYL_API_KEY}"
-    }
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(f"{PTERODACTYL_API_URL}/servers/{server_id}/suspend", headers=headers) as resp:
-                if resp.status == 204:
-                    print(f"Server {server_id} successfully suspended.")
-                else:
-                    print(f"Failed to suspend server {server_id}. Status code: {resp.status}")
-        except Exception as e:
-            print(f"Error suspending server {server_id}: {e}")
+    try:
+        status, _ = await panel_request('POST', f"/servers/{server_id}/suspend")
+        if status == 204:
+            print(f"Server {server_id} successfully suspended.")
+        else:
+            print(f"Failed to suspend server {server_id}. Status code: {status}")
+    except Exception as e:
+        print(f"Error suspending server {server_id}: {e}")
 
 # Send public alert via webhook
 async def send_public_alert(uuid, server_id):
@@ -92,15 +194,14 @@ async def send_public_alert(uuid, server_id):
         'footer': {'text': "Powered by Protect"}
     }
     payload = {'embeds': [embed]}
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(PUBLIC_WEBHOOK_URL, json=payload) as resp:
-                if resp.status == 204 or resp.status == 200:
-                    print(f"Public alert for container {uuid} sent")
-                else:
-                    print(f"Failed to send public alert for container {uuid}. Status code: {resp.status}")
-        except Exception as e:
-            print(f"Error sending public alert for container {uuid}: {e}")
+    try:
+        async with http_session.post(PUBLIC_WEBHOOK_URL, data=orjson.dumps(payload)) as resp:
+            if resp.status == 204 or resp.status == 200:
+                print(f"Public alert for container {uuid} sent")
+            else:
+                print(f"Failed to send public alert for container {uuid}. Status code: {resp.status}")
+    except Exception as e:
+        print(f"Error sending public alert for container {uuid}: {e}")
 
 # Send detailed private alert via webhook
 async def send_private_alert(uuid, server_id, flags):
@@ -127,37 +228,158 @@ async def send_private_alert(uuid, server_id, flags):
         'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ")
     }
     payload = {'embeds': [embed]}
-    async with aiohttp.ClientSession() as session:
+    try:
+        async with http_session.post(PRIVATE_WEBHOOK_URL, data=orjson.dumps(payload)) as resp:
+            if resp.status == 204 or resp.status == 200:
+                print(f"Private alert for container {uuid} sent")
+            else:
+                print(f"Failed to send private alert for container {uuid}. Status code: {resp.status}")
+    except Exception as e:
+        print(f"Error sending private alert for container {uuid}: {e}")
+
+# Byte table folding ASCII letters to lowercase
+ASCII_LOWER = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', b'abcdefghijklmnopqrstuvwxyz')
+
+# Fold raw bytes to lowercase ASCII and view them as text without UTF-8 decoding
+def fold_bytes(data):
+    return data.translate(ASCII_LOWER).decode('latin-1')
+
+# Turn a log pattern into the same representation as fold_bytes output
+def log_pattern_key(pattern):
+    return fold_bytes(pattern.encode('utf-8'))
+
+# Turn a file content pattern into the latin-1 view of its UTF-8 bytes
+def file_pattern_key(pattern):
+    return pattern.encode('utf-8').decode('latin-1')
+
+# Pattern check types and how their patterns are normalized before matching
+PATTERN_CHECK_TYPES = {
+    'file_content': file_pattern_key,
+    'log_content': log_pattern_key,
+    'dependency': str.lower,
+}
+
+# Compile a list of patterns into an Aho-Corasick automaton, or None if empty
+def build_pattern_automaton(patterns, normalize):
+    automaton = ahocorasick.Automaton()
+    for pattern in patterns:
+        automaton.add_word(normalize(pattern) if normalize else pattern, pattern)
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
+# Check types that operate on check_config['path'] inside the volume
+FILE_CHECK_TYPES = {'file_existence', 'file_content', 'file_size'}
+
+# Validate the checks of a strategy once, resolve their check functions and
+# precompute lookup structures so the scan loop only does lookups
+def compile_strategy_checks(strategy):
+    checks = []
+    for check_config in strategy['checks']:
+        if not check_config or not isinstance(check_config, dict) or not check_config.get('type'):
+            print(f"Invalid check configuration in strategy {strategy['name']}. Skipping.")
+            continue
+        check_type = check_config['type']
+        if check_type not in CHECK_DISPATCH:
+            print(f"Unknown check type: {check_type} in strategy {strategy['name']}. Skipping.")
+            continue
+        if check_type in FILE_CHECK_TYPES and not (check_config.get('path') and isinstance(check_config['path'], str)):
+            print(f"Path not defined for {check_type} check in strategy {strategy['name']}. Skipping.")
+            continue
+        patterns = check_config.get('patterns', [])
+        if not isinstance(patterns, list) or not all(isinstance(p, str) and p for p in patterns):
+            print(f"Invalid patterns in {check_type} check of strategy {strategy['name']}: patterns must be non-empty strings. Skipping.")
+            continue
+        if check_type == 'process_check' and 'command' in check_config and 'ps_args' not in check_config:
+            print(f"process_check in strategy {strategy['name']} sets 'command', which is no longer used. "
+                  f"Processes are listed with docker top; set 'ps_args' instead (default: '-eo pid,pcpu,comm').")
         try:
-            async with session.post(PRIVATE_WEBHOOK_URL, json=payload) as resp:
-                if resp.status == 204 or resp.status == 200:
-                    print(f"Private alert for container {uuid} sent")
+            if check_type in PATTERN_CHECK_TYPES:
+                check_config['_ac'] = build_pattern_automaton(patterns, PATTERN_CHECK_TYPES[check_type])
+                if check_type == 'file_content':
+                    # Bytes carried between read chunks so boundary-straddling matches are found
+                    check_config['_overlap'] = max((len(file_pattern_key(p)) for p in patterns), default=1) - 1
+            elif check_type == 'file_existence':
+                # Plain file names only need a stat; single-level wildcards share one
+                # directory scan; patterns spanning subdirectories still use glob.
+                # A wildcard in path itself can only be expanded by glob, so then
+                # every pattern goes through glob.
+                if glob.has_magic(check_config.get('path') or ''):
+                    check_config['_literals'] = []
+                    check_config['_wildcards'] = []
+                    check_config['_globs'] = list(patterns)
                 else:
-                    print(f"Failed to send private alert for container {uuid}. Status code: {resp.status}")
+                    check_config['_literals'] = [p for p in patterns if not glob.has_magic(p)]
+                    wildcards = [p for p in patterns if glob.has_magic(p)]
+                    check_config['_wildcards'] = [
+                        (p.startswith('.'), re.compile(fnmatch.translate(p)).match)
+                        for p in wildcards if os.sep not in p
+                    ]
+                    check_config['_globs'] = [p for p in wildcards if os.sep in p]
         except Exception as e:
-            print(f"Error sending private alert for container {uuid}: {e}")
+            print(f"Error compiling {check_type} check in strategy {strategy['name']}: {e}. Skipping.")
+            continue
+        check_config['_fn'] = CHECK_DISPATCH[check_type]
+        checks.append(check_config)
+    strategy['checks'] = checks
+
+# Return the first pattern found in text by a compiled automaton, or None
+def find_pattern(automaton, text):
+    if automaton is None:
+        return None
+    for _, pattern in automaton.iter(text):
+        return pattern
+    return None
+
+# Load and compile a single .protect file, returning None if it is invalid
+def load_strategy_file(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            strategy = orjson.loads(f.read())
+        if not strategy.get('name') or not strategy.get('type') or not isinstance(strategy.get('checks'), list):
+            print(f"Invalid strategy structure in file {file_path.name}. Skipping.")
+            return None
+        compile_strategy_checks(strategy)
+        print(f"Loaded strategy: {strategy['name']} from {file_path.name}")
+        return strategy
+    except Exception as e:
+        print(f"Error loading strategy from {file_path.name}: {e}")
+        return None
 
-# Load detection strategies from .protect files
+# Load detection strategies from .protect files. Called every scan cycle; only
+# files that were added or modified since the last call are parsed again.
 async def load_strategies():
-    strategies = []
+    changed = False
+    seen = set()
     try:
-        for file_path in STRATEGIES_DIR.glob('*.protect'):
-            try:
-                with open(file_path, 'r') as f:
-                    strategy = json.load(f)
-                    if not strategy.get('name') or not strategy.get('type') or not isinstance(strategy.get('checks'), list):
-                        print(f"Invalid strategy structure in file {file_path.name}. Skipping.")
-                        continue
-                    strategies.append(strategy)
-                    print(f"Loaded strategy: {strategy['name']} from {file_path.name}")
-            except Exception as e:
-                print(f"Error loading strategy from {file_path.name}: {e}")
+        with os.scandir(STRATEGIES_DIR) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.name.endswith('.protect') or not entry.is_file():
+                    continue
+                st = entry.stat()
+                # Size guards against edits within one tick of a coarse mtime
+                version = (st.st_mtime_ns, st.st_size)
+                seen.add(entry.path)
+                cached = strategy_cache.get(entry.path)
+                if cached and cached[0] == version:
+                    continue
+                strategy_cache[entry.path] = (version, load_strategy_file(Path(entry.path)))
+                changed = True
     except Exception as e:
         print(f"Error reading strategies directory: {e}")
+        seen = set(strategy_cache)
+
+    for path in list(strategy_cache):
+        if path not in seen:
+            print(f"Unloaded strategies from removed file {os.path.basename(path)}")
+            del strategy_cache[path]
+            changed = True
 
+    strategies = [strategy for _, strategy in strategy_cache.values() if strategy]
     if not strategies:
         print("No valid strategies loaded. Check your .protect files and permissions.")
-    else:
+    elif changed:
         print(f"Successfully loaded {len(strategies)} strategies.")
 
     return strategies
@@ -165,36 +387,13 @@ async def load_strategies():
 # Execute a given strategy on a Docker volume
 async def execute_strategy(strategy, volume_path, container):
     flags = []
-    print(f"Executing strategy: {strategy['name']} for volume {volume_path}")
-    if not isinstance(strategy.get('checks'), list):
-        print(f"Invalid checks array in strategy {strategy['name']} for volume {volume_path}")
-        return flags
-
+    logger.debug("Executing strategy: %s for volume %s", strategy['name'], volume_path)
     for check_config in strategy['checks']:
-        if not check_config or not isinstance(check_config, dict) or not check_config.get('type'):
-            print(f"Invalid check configuration in strategy {strategy['name']} for volume {volume_path}")
-            continue
-
-        flag_raised = False
-        message_template = check_config.get('message', "An undefined issue was detected")
         try:
-            print(f"Performing check type: {check_config['type']} for strategy {strategy['name']} on volume {volume_path}")
-            if check_config['type'] in ['file_existence', 'file_content', 'file_size']:
-                flag_data = await file_check(volume_path, check_config)
-            elif check_config['type'] == 'dependency':
-                flag_data = await dependency_check(volume_path, check_config)
-            elif check_config['type'] == 'log_content':
-                flag_data = await log_content_check(container, check_config)
-            elif check_config['type'] == 'process_check':
-                flag_data = await process_check(container, check_config)
-            elif check_config['type'] == 'network_usage':
-                flag_data = await network_usage_check(container, check_config)
-            else:
-                print(f"Unknown check type: {check_config['type']} in strategy {strategy['name']} for volume {volume_path}")
-                continue
-
+            logger.debug("Performing check type: %s for strategy %s on volume %s", check_config['type'], strategy['name'], volume_path)
+            flag_data = await check_config['_fn'](volume_path, container, check_config)
             if flag_data:
-                message = replace_placeholders(message_template, flag_data)
+                message = replace_placeholders(check_config.get('message', "An undefined issue was detected"), flag_data)
                 flags.append(message)
                 print(f"Flag raised: {message}")
 
@@ -213,46 +412,67 @@ def replace_placeholders(template, data):
         processes=', '.join(data.get('processes', []))
     )
 
-# File checks
-async def file_check(volume_path, check_config):
-    if not check_config.get('path'):
-        print(f"Path not defined for check {check_config['type']} in volume {volume_path}")
-        return False
-
-    target_path = os.path.join(volume_path, check_config['path'])
-
-    if check_config['type'] == 'file_existence':
-        return await file_existence_check(target_path, check_config)
-    elif check_config['type'] == 'file_content':
-        return await file_content_check(target_path, check_config)
-    elif check_config['type'] == 'file_size':
-        return await file_size_check(target_path, check_config)
-    else:
-        raise ValueError(f"Invalid file check type: {check_config['type']}")
+# Return the first directory entry matching a compiled wildcard, like glob would
+def find_matching_entry(target_path, wildcards):
+    try:
+        with os.scandir(target_path) as entries:
+            for entry in entries:
+                hidden = entry.name[0] == '.'
+                for matches_hidden, match in wildcards:
+                    # glob only returns dotfiles for patterns that start with a dot
+                    if hidden and not matches_hidden:
+                        continue
+                    if match(entry.name):
+                        return entry.name
+    except OSError:
+        pass
+    return None
 
 # Check for the existence of files matching patterns
-async def file_existence_check(target_path, check_config):
-    patterns = check_config.get('patterns', [])
-    for pattern in patterns:
+async def file_existence_check(volume_path, container, check_config):
+    target_path = os.path.join(volume_path, check_config['path'])
+    for name in check_config.get('_literals', []):
+        if os.path.lexists(os.path.join(target_path, name)):
+            return {'filename': os.path.basename(name)}
+    wildcards = check_config.get('_wildcards')
+    if wildcards:
+        filename = await asyncio.to_thread(find_matching_entry, target_path, wildcards)
+        if filename:
+            return {'filename': filename}
+    for pattern in check_config.get('_globs', []):
         full_pattern = os.path.join(target_path, pattern)
         matches = glob.glob(full_pattern)
         if matches:
             return {'filename': os.path.basename(matches[0])}
     return False
 
+# Stream a file through an automaton in fixed-size chunks, so memory use does
+# not grow with the file size
+def scan_file_for_pattern(file_path, automaton, overlap):
+    tail = ''
+    with open(file_path, 'rb') as f:
+        advise_sequential(f)
+        while chunk := f.read(READ_CHUNK_SIZE):
+            text = tail + chunk.decode('latin-1')
+            pattern = find_pattern(automaton, text)
+            if pattern is not None:
+                return pattern
+            tail = text[-overlap:] if overlap else ''
+    return None
+
 # Check if file content matches any of the patterns
-async def file_content_check(target_path, check_config):
-    patterns = check_config.get('patterns', [])
-    if os.path.exists(target_path):
-        with open(target_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            for pattern in patterns:
-                if pattern in content:
-                    return {'pattern': pattern}
+async def file_content_check(volume_path, container, check_config):
+    target_path = os.path.join(volume_path, check_config['path'])
+    automaton = check_config.get('_ac')
+    if automaton is not None and os.path.exists(target_path):
+        pattern = await asyncio.to_thread(scan_file_for_pattern, target_path, automaton, check_config.get('_overlap', 0))
+        if pattern is not None:
+            return {'pattern': pattern}
     return False
 
 # Check if file size exceeds the maximum size
-async def file_size_check(target_path, check_config):
+async def file_size_check(volume_path, container, check_config):
+    target_path = os.path.join(volume_path, check_config['path'])
     max_size = check_config.get('max_size', 0)
     if os.path.exists(target_path):
         size = os.path.getsize(target_path)
@@ -261,20 +481,18 @@ async def file_size_check(target_path, check_config):
     return False
 
 # Check for malicious or unauthorized dependencies
-async def dependency_check(volume_path, check_config):
+async def dependency_check(volume_path, container, check_config):
     file_name = check_config.get('file', 'package.json')
-    patterns = check_config.get('patterns', [])
+    automaton = check_config.get('_ac')
     package_file = os.path.join(volume_path, file_name)
     if os.path.exists(package_file):
         try:
-            with open(package_file, 'r') as f:
-                package_data = json.load(f)
-            dependencies = package_data.get('dependencies', {})
-            dependencies.update(package_data.get('devDependencies', {}))
-            for pattern in patterns:
-                for dep_name in dependencies.keys():
-                    if pattern.lower() in dep_name.lower():
-                        return {'dependency': dep_name}
+            with open(package_file, 'rb') as f:
+                package_data = orjson.loads(f.read())
+            dependencies = chain(package_data.get('dependencies') or {}, package_data.get('devDependencies') or {})
+            for dep_name in dependencies:
+                if find_pattern(automaton, dep_name.lower()) is not None:
+                    return {'dependency': dep_name}
         except Exception as e:
             print(f"Error parsing {file_name} in {package_file}: {e}")
     else:
@@ -282,53 +500,85 @@ async def dependency_check(volume_path, check_config):
     return False
 
 # Check container logs for patterns
-async def log_content_check(container, check_config):
-    patterns = check_config.get('patterns', [])
+async def log_content_check(volume_path, container, check_config):
     try:
-        logs = container.logs(tail=1000).decode('utf-8')
-        for pattern in patterns:
-            if pattern.lower() in logs.lower():
-                return {'pattern': pattern}
+        logs = await asyncio.to_thread(container.logs, tail=1000, stream=False)
+        pattern = find_pattern(check_config.get('_ac'), fold_bytes(logs))
+        if pattern is not None:
+            return {'pattern': pattern}
     except Exception as e:
         print(f"Error checking container logs: {e}")
     return False
 
-# Check for processes consuming more CPU than the specified threshold
-async def process_check(container, check_config):
-    cmd = check_config.get('command')
+# Check for processes consuming more CPU than the specified threshold.
+# Uses the daemon's top endpoint, which runs ps on the host, so nothing is
+# executed inside the container.
+async def process_check(volume_path, container, check_config):
+    ps_args = check_config.get('ps_args', '-eo pid,pcpu,comm')
     cpu_threshold = check_config.get('cpu_threshold', 0)
     try:
-        exec_instance = container.exec_run(cmd, stdout=True, stderr=True)
-        output = exec_instance.output.decode('utf-8')
+        top = await asyncio.to_thread(container.top, ps_args=ps_args)
+        titles = top.get('Titles') or []
+        if '%CPU' not in titles:
+            print(f"No %CPU column in process list of container {container.id}")
+            return False
+        cpu_column = titles.index('%CPU')
         high_cpu_processes = []
-        for line in output.strip().split('\n'):
-            parts = line.strip().split()
-            if len(parts) > 8:
-                try:
-                    cpu_usage = float(parts[8])
-                    if cpu_usage > cpu_threshold:
-                        high_cpu_processes.append(line.strip())
-                except ValueError:
-                    continue
+        for process in top.get('Processes') or []:
+            try:
+                cpu_usage = float(process[cpu_column])
+            except (IndexError, ValueError):
+                continue
+            if cpu_usage > cpu_threshold:
+                high_cpu_processes.append(' '.join(process))
         if high_cpu_processes:
             return {'processes': high_cpu_processes}
     except Exception as e:
         print(f"Error checking container processes: {e}")
     return False
 
+# Get total rx+tx bytes of a container, sampled at most once per scan cycle.
+# The counters are cumulative, so a one-shot sample avoids the daemon's 1 s
+# wait for a second CPU sample. Daemons older than API 1.41 (Docker 20.10)
+# do not support one-shot stats and fall back to a regular sample.
+async def get_network_usage(container):
+    global stats_one_shot
+    if container.id not in network_usage_cache:
+        stats = None
+        if stats_one_shot:
+            try:
+                stats = await asyncio.to_thread(container.stats, stream=False, one_shot=True)
+            except docker.errors.InvalidVersion:
+                print("Docker daemon does not support one-shot stats. Falling back to regular stats.")
+                stats_one_shot = False
+        if stats is None:
+            stats = await asyncio.to_thread(container.stats, stream=False)
+        networks = stats.get('networks', {})
+        network_usage_cache[container.id] = sum(net.get('rx_bytes', 0) + net.get('tx_bytes', 0) for net in networks.values())
+    return network_usage_cache[container.id]
+
 # Check if container network usage exceeds the specified threshold
-async def network_usage_check(container, check_config):
+async def network_usage_check(volume_path, container, check_config):
     threshold = check_config.get('threshold', 0)
     try:
-        stats = container.stats(stream=False)
-        networks = stats.get('networks', {})
-        total_usage = sum(net.get('rx_bytes', 0) + net.get('tx_bytes', 0) for net in networks.values())
+        total_usage = await get_network_usage(container)
         if total_usage > threshold:
             return {'usage': total_usage}
     except Exception as e:
         print(f"Error checking container network usage: {e}")
     return False
 
+# Check functions by type, called as fn(volume_path, container, check_config)
+CHECK_DISPATCH = {
+    'file_existence': file_existence_check,
+    'file_content': file_content_check,
+    'file_size': file_size_check,
+    'dependency': dependency_check,
+    'log_content': log_content_check,
+    'process_check': process_check,
+    'network_usage': network_usage_check,
+}
+
 # Apply strategies to a given Docker volume
 async def check_volume(uuid, strategies):
     volume_path = os.path.join(VOLUMES_DIR, uuid)
@@ -338,7 +588,7 @@ async def check_volume(uuid, strategies):
         return flags
 
     try:
-        container = docker_client.containers.get(uuid)
+        container = await asyncio.to_thread(docker_client.containers.get, uuid)
     except docker.errors.NotFound:
         print(f"Container {uuid} not found. Skipping...")
         return flags
@@ -352,38 +602,88 @@ async def check_volume(uuid, strategies):
 
     return flags
 
-# Scan all Docker containers/volumes
+# Scan all Docker containers/volumes, bounded by SCAN_CONCURRENCY
 async def scan_all_containers(strategies):
-    for uuid in os.listdir(VOLUMES_DIR):
+    network_usage_cache.clear()
+    semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+    index_lock = asyncio.Lock()
+    # Fetched lazily on the first flag and reused for the rest of this cycle.
+    # A failed fetch leaves it None and is not retried until the next cycle.
+    uuid_index = None
+    uuid_index_fetched = False
+    newly_flagged = False
+
+    async def get_uuid_index():
+        nonlocal uuid_index, uuid_index_fetched
+        async with index_lock:
+            if not uuid_index_fetched:
+                uuid_index = await build_uuid_index()
+                uuid_index_fetched = True
+        return uuid_index
+
+    async def scan_container(uuid):
+        nonlocal newly_flagged
+        async with semaphore:
+            try:
+                flags = await check_volume(uuid, strategies)
+                if flags:
+                    server_index = await get_uuid_index()
+                    if server_index is None:
+                        print(f"Panel server list unavailable; container {uuid} will be rechecked next scan")
+                        return
+                    server_id = server_index.get(uuid)
+                    if server_id:
+                        await suspend_server(server_id)
+                    await send_public_alert(uuid, server_id)
+                    await send_private_alert(uuid, server_id, flags)
+                    flagged_containers[uuid] = True
+                    newly_flagged = True
+            except Exception as e:
+                print(f"Error processing volume {uuid}: {e}")
+
+    uuids = []
+    for uuid in await asyncio.to_thread(os.listdir, VOLUMES_DIR):
         if flagged_containers.get(uuid):
             print(f"Container {uuid} is already flagged. Skipping...")
             continue
+        uuids.append(uuid)
+
+    await asyncio.gather(*(scan_container(uuid) for uuid in uuids), return_exceptions=True)
+
+    if newly_flagged:
         try:
-            flags = await check_volume(uuid, strategies)
-            if flags:
-                server_id = await get_server_id_from_uuid(uuid)
-                if server_id:
-                    await suspend_server(server_id)
-                await send_public_alert(uuid, server_id)
-                await send_private_alert(uuid, server_id, flags)
-                flagged_containers[uuid] = True
-                with open('flagged.json', 'w') as f:
-                    json.dump(flagged_containers, f)
+            await asyncio.to_thread(atomic_write_json, 'flagged.json', dict(flagged_containers))
         except Exception as e:
-            print(f"Error processing volume {uuid}: {e}")
+            print(f"Error saving flagged containers: {e}")
+
+    # Drop cached hashes of files that were not looked at this cycle
+    for file_path in hash_cache.keys() - hash_cache_used:
+        del hash_cache[file_path]
+    hash_cache_used.clear()
 
 # Main loop for continuous scanning
 async def main():
+    global http_session, panel_semaphore
     print("Starting continuous container abuse detection...")
-    strategies = await load_strategies()
-    while True:
-        try:
-            await scan_all_containers(strategies)
-            print("Scanning completed. Waiting 180 seconds before next scan...")
-        except Exception as e:
-            print(f"Error in scanning loop: {e}")
-        finally:
-            await asyncio.sleep(180)  # Wait 3 minutes before next scan
+    # Docker and filesystem calls run in worker threads, so give them a larger pool
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=64))
+    connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+    # Every request body is JSON, so Content-Type is a session default
+    http_session = aiohttp.ClientSession(connector=connector, headers={'Content-Type': "application/json"})
+    panel_semaphore = asyncio.Semaphore(PANEL_CONCURRENCY)
+    try:
+        while True:
+            try:
+                strategies = await load_strategies()
+                await scan_all_containers(strategies)
+                print("Scanning completed. Waiting 180 seconds before next scan...")
+            except Exception as e:
+                print(f"Error in scanning loop: {e}")
+            finally:
+                await asyncio.sleep(180)  # Wait 3 minutes before next scan
+    finally:
+        await http_session.close()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=config.get('log_level', 'INFO'), format="%(message)s")
     asyncio.run(main())
\ No newline at end of file